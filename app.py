@@ -1,16 +1,18 @@
 import os
 import sys
 import logging
-from datetime import datetime
 from pathlib import Path
 
-import pandas as pd
-from flask import Flask, request, jsonify, redirect, url_for, session, render_template, send_from_directory
+from flask import Flask, Blueprint, Response, jsonify, current_app, render_template, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
-from flask_dance.contrib.google import make_google_blueprint, google
+import orjson
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+
+from models import db, User
+from auth import auth_bp, cache, register_google_oauth, USER_CACHE_TIMEOUT
+from processing import processing_bp, init_celery, PROCESSOR_AVAILABLE
 
 # ------------------------------------------------------------------------------
 # Setup & Config
@@ -26,197 +28,179 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Flask App
-app = Flask(__name__)
-CORS(app)
-
-# Secret Key
-SECRET_KEY = os.environ.get("SECRET_KEY", "dev-secret-change-me")
-app.config["SECRET_KEY"] = SECRET_KEY
-
-# Database (prefer Postgres via DATABASE_URL, fallback to SQLite)
-DATABASE_URL = os.environ.get("DATABASE_URL")
-if DATABASE_URL:
-    app.config["SQLALCHEMY_DATABASE_URI"] = DATABASE_URL
-else:
-    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{BASE_DIR / 'marksheetpro.db'}"
-    # Allow SQLite threading for small setups
-    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"connect_args": {"check_same_thread": False}}
-
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-db = SQLAlchemy(app)
-
-# Uploads
-UPLOAD_FOLDER = BASE_DIR / "uploads"
-OUTPUT_FOLDER = BASE_DIR / "output"
-for folder in [UPLOAD_FOLDER, OUTPUT_FOLDER]:
-    folder.mkdir(exist_ok=True)
-app.config["UPLOAD_FOLDER"] = str(UPLOAD_FOLDER)
-
-# ------------------------------------------------------------------------------
-# Processor Import (graceful)
-# ------------------------------------------------------------------------------
-
-PROCESSOR_AVAILABLE = False
-try:
-    from processor import process_marksheet
-    PROCESSOR_AVAILABLE = True
-    logger.info("✅ Processor module imported successfully")
-except Exception as e:
-    PROCESSOR_AVAILABLE = False
-    logger.exception("⚠️ processor import failed — processing endpoints will return 503")
-
-# ------------------------------------------------------------------------------
-# OAuth Config (Google)
-# ------------------------------------------------------------------------------
-
-GOOGLE_CLIENT_ID = os.environ.get("GOOGLE_CLIENT_ID")
-GOOGLE_CLIENT_SECRET = os.environ.get("GOOGLE_CLIENT_SECRET")
-
-if GOOGLE_CLIENT_ID and GOOGLE_CLIENT_SECRET:
-    google_bp = make_google_blueprint(
-        client_id=GOOGLE_CLIENT_ID,
-        client_secret=GOOGLE_CLIENT_SECRET,
-        scope=["profile", "email"],
-        redirect_url="/auth/google/callback"
-    )
-    app.register_blueprint(google_bp, url_prefix="/login")
-
-# ------------------------------------------------------------------------------
-# Database Models
-# ------------------------------------------------------------------------------
-
-class User(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(80), unique=True, nullable=False)
-    email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(256))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-    @property
-    def password(self):
-        raise AttributeError("Password is write-only")
-
-    @password.setter
-    def password(self, pw):
-        self.password_hash = generate_password_hash(pw)
-
-    def check_password(self, pw):
-        return check_password_hash(self.password_hash, pw)
-
-
-class Marksheet(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    filename = db.Column(db.String(200))
-    type = db.Column(db.String(50))
-    status = db.Column(db.String(50), default="uploaded")
-    user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+main_bp = Blueprint("main", __name__)
+
+class ORJSONProvider(DefaultJSONProvider):
+    """jsonify() backed by orjson, which serializes in a single C pass.
+
+    Calls that pass options (the session serializer's ``separators`` and
+    ``object_hook``) are left to the default provider, which honours them.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps(obj), mimetype=self.mimetype)
+
+def set_sqlite_pragmas(dbapi_con, _):
+    """WAL lets history reads proceed while an upload commits; NORMAL sync is
+    safe under WAL and avoids an fsync per commit."""
+    cur = dbapi_con.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute("PRAGMA temp_store=MEMORY")
+    cur.execute("PRAGMA mmap_size=268435456")
+    cur.close()
+
+def create_app():
+    app = Flask(__name__)
+    app.json = ORJSONProvider(app)
+
+    # The UI is served by this app, so CORS is only needed for a separate
+    # frontend; preflights are cached by the browser for a day
+    frontend_origin = os.environ.get("FRONTEND_ORIGIN")
+    if frontend_origin:
+        origins = [o.strip() for o in frontend_origin.split(",")]
+        CORS(app, resources={r"/(api|process|output)/.*": {"origins": origins}},
+             supports_credentials=True, max_age=86400)
+
+    # Secret Key
+    app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", "dev-secret-change-me")
+
+    # Database (prefer Postgres via DATABASE_URL, fallback to SQLite)
+    database_url = os.environ.get("DATABASE_URL")
+    if database_url:
+        app.config["SQLALCHEMY_DATABASE_URI"] = database_url
+    else:
+        app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{BASE_DIR / 'marksheetpro.db'}"
+
+    # Pooled connections plus a larger compiled-statement cache for the small,
+    # repeated lookups (users, marksheets) this app issues on every request
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        "pool_size": 10,
+        "max_overflow": 20,
+        "pool_timeout": 30,
+        "pool_pre_ping": True,
+        "pool_recycle": 1800,
+        "query_cache_size": 1200,
+        # Allow SQLite threading for small setups
+        "connect_args": {"check_same_thread": False} if database_url is None else {},
+    }
+
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+    if database_url is None:
+        with app.app_context():
+            event.listen(db.engine, "connect", set_sqlite_pragmas)
+
+    # Uploads
+    upload_folder = BASE_DIR / "uploads"
+    output_folder = BASE_DIR / "output"
+    for folder in [upload_folder, output_folder]:
+        folder.mkdir(exist_ok=True)
+    app.config["UPLOAD_FOLDER"] = str(upload_folder)
+    app.config["OUTPUT_FOLDER"] = str(output_folder)
+    # Enforced by Werkzeug for both multipart uploads and raw request.stream reads
+    app.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("MAX_FILE_SIZE", 10 * 1024 * 1024))
+
+    # Let the front-end server transfer output files: X-Sendfile (Apache,
+    # lighttpd) or nginx X-Accel-Redirect to an internal location
+    app.config["USE_X_SENDFILE"] = os.environ.get("USE_X_SENDFILE", "false").lower() == "true"
+    app.config["OUTPUT_ACCEL_PREFIX"] = os.environ.get("OUTPUT_ACCEL_PREFIX")
+
+    # Background processing on Celery workers when a broker is configured
+    redis_url = os.environ.get("REDIS_URL")
+
+    # User-lookup cache; set CACHE_TYPE=RedisCache to share it between workers
+    app.config["CACHE_TYPE"] = os.environ.get("CACHE_TYPE", "SimpleCache")
+    app.config["CACHE_DEFAULT_TIMEOUT"] = USER_CACHE_TIMEOUT
+    app.config["CACHE_REDIS_URL"] = os.environ.get("CACHE_REDIS_URL", redis_url)
+    cache.init_app(app)
+
+    if redis_url:
+        init_celery(app, redis_url)
+
+    register_google_oauth(app)
+    app.register_blueprint(main_bp)
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(processing_bp)
+
+    @app.cli.command("init-db")
+    def init_db():
+        """Create tables and, if CREATE_DEFAULT_ADMIN is set, the admin user."""
+        create_tables(app)
+
+    return app
 
 # ------------------------------------------------------------------------------
 # Utility: Create Tables + Default Admin (optional)
 # ------------------------------------------------------------------------------
 
-def create_tables():
+def create_tables(app):
     with app.app_context():
         db.create_all()
         if os.environ.get("CREATE_DEFAULT_ADMIN", "false").lower() == "true":
-            if not User.query.filter_by(username="admin").first():
-                admin_pw = os.environ.get("ADMIN_PASSWORD", "admin123")
-                admin = User(username="admin", email="admin@marksheetpro.com")
-                admin.password = admin_pw
-                db.session.add(admin)
+            admin = User(username="admin", email="admin@marksheetpro.com")
+            admin.password = os.environ.get("ADMIN_PASSWORD", "admin123")
+            db.session.add(admin)
+            try:
                 db.session.commit()
                 logger.info("✅ Default admin created")
+            except IntegrityError:
+                # Username or email already taken: the admin exists
+                db.session.rollback()
 
 # ------------------------------------------------------------------------------
 # Routes
 # ------------------------------------------------------------------------------
 
-@app.route("/")
+@main_bp.route("/")
 def home():
     return render_template("index.html")
 
-@app.route("/auth/google/callback")
-def google_auth_callback():
-    if not google.authorized:
-        return redirect(url_for("google.login"))
-    resp = google.get("/oauth2/v2/userinfo")
-    if not resp.ok:
-        return jsonify({"success": False, "message": "Failed to fetch user info"}), 400
-    info = resp.json()
-    email = info.get("email")
-    username = info.get("name")
-
-    user = User.query.filter_by(email=email).first()
-    if not user:
-        user = User(username=username, email=email)
-        db.session.add(user)
-        db.session.commit()
-    session["user_id"] = user.id
-    return jsonify({"success": True, "message": "Logged in with Google", "user": {"username": username, "email": email}})
-
-@app.route("/process/<marksheet_type>", methods=["POST"])
-def process_marksheet_route(marksheet_type):
-    if not PROCESSOR_AVAILABLE:
-        return jsonify({"success": False, "message": "Processing unavailable on this server"}), 503
-
-    if "file" not in request.files:
-        return jsonify({"success": False, "message": "No file uploaded"}), 400
-
-    file = request.files["file"]
-    if not file or file.filename == "":
-        return jsonify({"success": False, "message": "Empty file"}), 400
-
-    filename = secure_filename(file.filename)
-    filepath = UPLOAD_FOLDER / filename
-    file.save(filepath)
-
-    try:
-        df = process_marksheet(str(filepath), marksheet_type)
-        if not hasattr(df, "__len__"):
-            return jsonify({"success": False, "message": "Invalid processor result"}), 500
-
-        output_filename = f"{filepath.stem}_{marksheet_type}_processed.xlsx"
-        output_path = OUTPUT_FOLDER / output_filename
-        df.to_excel(output_path, index=False)
-
-        ms = Marksheet(filename=filename, type=marksheet_type, status="processed")
-        db.session.add(ms)
-        db.session.commit()
-
-        return jsonify({
-            "success": True,
-            "message": f"Processed {len(df)} records",
-            "output_file": f"/output/{output_filename}"
-        })
-    except Exception as e:
-        logger.exception("Processing error")
-        return jsonify({"success": False, "message": str(e)}), 500
-
-@app.route("/output/<path:filename>")
-def serve_output(filename):
-    return send_from_directory(OUTPUT_FOLDER, filename)
-
 # ------------------------------------------------------------------------------
 # Debug Routes (DEV only, don’t expose in prod)
 # ------------------------------------------------------------------------------
 
-@app.route("/api/debug/users")
+@main_bp.route("/api/debug/users")
 def debug_users():
     if os.environ.get("FLASK_DEBUG", "false").lower() != "true":
         return jsonify({"error": "Debug routes disabled"}), 403
-    users = User.query.all()
-    return jsonify([{"id": u.id, "username": u.username, "email": u.email} for u in users])
+    rows = (
+        db.session.query(User.id, User.username, User.email)
+        .order_by(User.id)
+        .execution_options(stream_results=True)
+        .yield_per(500)
+    )
+
+    dumps = current_app.json.dumps
+
+    def generate():
+        # Emit the JSON array one user at a time as rows arrive
+        yield "["
+        for i, u in enumerate(rows):
+            yield ("," if i else "") + dumps({"id": u.id, "username": u.username, "email": u.email})
+        yield "]"
 
-@app.route("/debug/database-info")
+    return Response(stream_with_context(generate()), mimetype="application/json")
+
+@main_bp.route("/debug/database-info")
 def debug_db_info():
     if os.environ.get("FLASK_DEBUG", "false").lower() != "true":
         return jsonify({"error": "Debug routes disabled"}), 403
     return jsonify({
-        "database_uri": app.config["SQLALCHEMY_DATABASE_URI"],
-        "upload_folder": str(UPLOAD_FOLDER),
-        "output_folder": str(OUTPUT_FOLDER),
+        "database_uri": current_app.config["SQLALCHEMY_DATABASE_URI"],
+        "upload_folder": current_app.config["UPLOAD_FOLDER"],
+        "output_folder": current_app.config["OUTPUT_FOLDER"],
         "processor_available": PROCESSOR_AVAILABLE
     })
 
@@ -224,8 +208,22 @@ def debug_db_info():
 # Entry Point
 # ------------------------------------------------------------------------------
 
+def __getattr__(name):
+    """Build the module-level ``app``/``celery`` on first access.
+
+    ``gunicorn app:app``, ``celery -A app.celery worker`` and check_users.py
+    get them as before, but merely importing this module (``flask --app
+    app:create_app``, worker processes) does not construct an extra app.
+    """
+    if name not in ("app", "celery"):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    app = create_app()
+    globals().update(app=app, celery=app.extensions.get("celery"))
+    return globals()[name]
+
 if __name__ == "__main__":
-    create_tables()
+    app = create_app()
+    create_tables(app)
     port = int(os.environ.get("PORT", 5000))
     host = os.environ.get("HOST", "0.0.0.0")
     debug = os.environ.get("FLASK_DEBUG", "false").lower() == "true"
@@ -0,0 +1,89 @@
+import os
+
+from flask import Blueprint, jsonify, redirect, url_for, session, g
+from flask_caching import Cache
+from flask_dance.contrib.google import make_google_blueprint, google
+
+from models import db, User
+
+auth_bp = Blueprint("auth", __name__)
+
+# Shared user-lookup cache (SimpleCache per process, RedisCache across workers)
+cache = Cache()
+USER_CACHE_TIMEOUT = 60
+
+# ------------------------------------------------------------------------------
+# OAuth Config (Google)
+# ------------------------------------------------------------------------------
+
+def register_google_oauth(app):
+    """Mount Flask-Dance's Google login under /login when credentials are set."""
+    client_id = os.environ.get("GOOGLE_CLIENT_ID")
+    client_secret = os.environ.get("GOOGLE_CLIENT_SECRET")
+    if not (client_id and client_secret):
+        return
+
+    google_bp = make_google_blueprint(
+        client_id=client_id,
+        client_secret=client_secret,
+        scope=["profile", "email"],
+        redirect_url="/auth/google/callback"
+    )
+    app.register_blueprint(google_bp, url_prefix="/login")
+
+# ------------------------------------------------------------------------------
+# Auth Helpers
+# ------------------------------------------------------------------------------
+
+@cache.memoize(USER_CACHE_TIMEOUT)
+def _load_user(uid):
+    return db.session.get(User, uid)
+
+def forget_user(uid):
+    """Drop a user from the cache after logout or a profile change."""
+    cache.delete_memoized(_load_user, uid)
+
+def current_user():
+    """Logged-in User for this request, loaded at most once per request.
+
+    Lookups are also cached across requests for USER_CACHE_TIMEOUT seconds,
+    so the returned instance may be detached: re-fetch it before modifying.
+    """
+    if "user" in g:
+        return g.user
+    uid = session.get("user_id")
+    g.user = _load_user(uid) if uid else None
+    return g.user
+
+# ------------------------------------------------------------------------------
+# Routes
+# ------------------------------------------------------------------------------
+
+@auth_bp.route("/auth/google/callback")
+def google_auth_callback():
+    if not google.authorized:
+        return redirect(url_for("google.login"))
+    resp = google.get("/oauth2/v2/userinfo")
+    if not resp.ok:
+        return jsonify({"success": False, "message": "Failed to fetch user info"}), 400
+    info = resp.json()
+    email = info.get("email")
+    username = info.get("name")
+
+    user = User.query.filter_by(email=email).first()
+    if not user:
+        user = User(username=username, email=email)
+        db.session.add(user)
+        db.session.flush()
+    # Read the id before commit expires the instance, which would re-SELECT it
+    session["user_id"] = user.id
+    db.session.commit()
+    return jsonify({"success": True, "message": "Logged in with Google", "user": {"username": username, "email": email}})
+
+@auth_bp.route("/api/auth/logout")
+def logout():
+    uid = session.pop("user_id", None)
+    if uid:
+        forget_user(uid)
+    g.pop("user", None)
+    return jsonify({"success": True, "message": "Logged out"})
@@ -3,21 +3,30 @@ from app import app, db, User
 def check_users():
     with app.app_context():
         print("=== ALL USERS IN DATABASE ===")
-        users = User.query.all()
-        
-        if not users:
-            print("❌ NO USERS FOUND!")
-            return
-            
-        for user in users:
+        # Stream plain rows in batches instead of loading every User object
+        rows = (
+            db.session.query(User.id, User.username, User.email,
+                             User.password_hash.isnot(None).label("has_password"), User.created_at)
+            .order_by(User.id)
+            .execution_options(stream_results=True)
+            .yield_per(500)
+        )
+
+        total = 0
+        for user in rows:
+            total += 1
             print(f"ID: {user.id}")
             print(f"Username: '{user.username}'")
             print(f"Email: '{user.email}'")
-            print(f"Has Password: {'Yes' if user.password_hash else 'No'}")
+            print(f"Has Password: {'Yes' if user.has_password else 'No'}")
             print(f"Created: {user.created_at}")
             print("---")
-            
-        print(f"Total users: {len(users)}")
+
+        if not total:
+            print("❌ NO USERS FOUND!")
+            return
+
+        print(f"Total users: {total}")
 
 if __name__ == "__main__":
     check_users()
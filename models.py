@@ -0,0 +1,63 @@
+from datetime import datetime
+
+from flask_sqlalchemy import SQLAlchemy
+from werkzeug.security import check_password_hash
+from argon2 import PasswordHasher
+from argon2.exceptions import VerificationError, InvalidHashError
+
+db = SQLAlchemy()
+
+# Password hashing (Argon2id; legacy Werkzeug hashes are upgraded on login)
+ph = PasswordHasher(time_cost=2, memory_cost=65536, parallelism=1)
+LEGACY_HASH_PREFIXES = ("pbkdf2:", "scrypt:")
+ARGON2_HASH_PREFIX = "$argon2id$"
+MAX_PASSWORD_LENGTH = 1024
+
+# ------------------------------------------------------------------------------
+# Database Models
+# ------------------------------------------------------------------------------
+
+class User(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(80), unique=True, nullable=False)
+    email = db.Column(db.String(120), unique=True, nullable=False)
+    password_hash = db.Column(db.String(256))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @property
+    def password(self):
+        raise AttributeError("Password is write-only")
+
+    @password.setter
+    def password(self, pw):
+        self.password_hash = ph.hash(pw)
+
+    def check_password(self, pw):
+        # Cheap rejects first, so bad input never costs a hash computation
+        if not pw or not self.password_hash or len(pw) > MAX_PASSWORD_LENGTH:
+            return False
+        if self.password_hash.startswith(LEGACY_HASH_PREFIXES):
+            if not check_password_hash(self.password_hash, pw):
+                return False
+            self.password_hash = ph.hash(pw)
+            return True
+        if not self.password_hash.startswith(ARGON2_HASH_PREFIX):
+            return False
+        try:
+            ph.verify(self.password_hash, pw)
+        except (VerificationError, InvalidHashError):
+            return False
+        if ph.check_needs_rehash(self.password_hash):
+            self.password_hash = ph.hash(pw)
+        return True
+
+
+class Marksheet(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    filename = db.Column(db.String(200))
+    type = db.Column(db.String(50))
+    status = db.Column(db.String(50), default="uploaded")
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (db.Index("ix_marksheet_user_created", "user_id", "created_at"),)
@@ -0,0 +1,287 @@
+import io
+import os
+import shutil
+import logging
+from uuid import uuid4
+from pathlib import Path
+
+from flask import Blueprint, Response, current_app, request, jsonify, url_for, abort, send_file, send_from_directory
+from werkzeug.utils import secure_filename
+from werkzeug.security import safe_join
+
+from models import db, Marksheet
+from auth import current_user
+
+logger = logging.getLogger(__name__)
+
+processing_bp = Blueprint("processing", __name__)
+
+MARKSHEET_TYPES = ("10th", "12th", "semester")
+ALLOWED_EXTENSIONS = frozenset({"pdf", "png", "jpg", "jpeg"})
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+OUTPUT_MAX_AGE = 300
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# ------------------------------------------------------------------------------
+# Processor Import (graceful)
+# ------------------------------------------------------------------------------
+
+PROCESSOR_AVAILABLE = False
+try:
+    from processor import export_marksheet
+    PROCESSOR_AVAILABLE = True
+    logger.info("✅ Processor module imported successfully")
+except Exception as e:
+    PROCESSOR_AVAILABLE = False
+    logger.exception("⚠️ processor import failed — processing endpoints will return 503")
+
+# ------------------------------------------------------------------------------
+# Background Processing (Celery, optional)
+# ------------------------------------------------------------------------------
+
+def init_celery(app, broker_url):
+    """Attach a Celery app whose tasks run inside ``app``'s context.
+
+    Uploads are then queued (one queue per marksheet type) and processed by a
+    worker; without it they are processed in-request.
+    """
+    from celery import Celery, Task
+
+    class FlaskTask(Task):
+        def __call__(self, *args, **kwargs):
+            with app.app_context():
+                return self.run(*args, **kwargs)
+
+    celery_app = Celery(app.name, broker=broker_url, backend=broker_url, task_cls=FlaskTask)
+    celery_app.set_default()
+    celery_app.task(name="marksheet.run_processing")(run_processing)
+    app.extensions["celery"] = celery_app
+    return celery_app
+
+def discard_upload(saved_path):
+    try:
+        os.unlink(saved_path)
+    except FileNotFoundError:
+        pass
+
+def export_upload(marksheet_type, saved_path, output):
+    """OCR a saved upload straight into an .xlsx at ``output`` (a path or a
+    binary file object).
+
+    Rows are written as pages finish; returns how many were written. The
+    upload is deleted afterwards, whether or not processing succeeded.
+    """
+    saved_path = os.fspath(saved_path)
+    try:
+        return export_marksheet(marksheet_type, saved_path, output)
+    finally:
+        discard_upload(saved_path)
+
+def record_marksheet(filename, marksheet_type, user_id):
+    ms = Marksheet(filename=filename, type=marksheet_type, status="processed", user_id=user_id)
+    db.session.add(ms)
+    db.session.commit()
+
+def output_filename_for(filename, marksheet_type):
+    return f"{os.path.splitext(filename)[0]}_{marksheet_type}_processed.xlsx"
+
+def run_processing(marksheet_type, saved_path, user_id=None, filename=None):
+    """Run OCR on a saved upload, write the Excel output and record it.
+
+    ``filename`` is the client's name for the upload, used for the output
+    and the Marksheet record; it defaults to the saved file's name.
+    """
+    filename = filename or os.path.basename(saved_path)
+    # Unique like the upload path: same-named uploads (from one user or
+    # several) must never overwrite, or be served from cache as, each other
+    output_filename = f"{uuid4().hex}_{output_filename_for(filename, marksheet_type)}"
+    records = export_upload(marksheet_type, saved_path,
+                            os.path.join(current_app.config["OUTPUT_FOLDER"], output_filename))
+    record_marksheet(filename, marksheet_type, user_id)
+
+    return {"records": records, "output_file": f"/output/{output_filename}"}
+
+def download_processed(marksheet_type, saved_path, user_id=None, filename=None):
+    """Run OCR and return the workbook as the response body, skipping output/."""
+    filename = filename or os.path.basename(saved_path)
+    buf = io.BytesIO()
+    export_upload(marksheet_type, saved_path, buf)
+    buf.seek(0)
+    record_marksheet(filename, marksheet_type, user_id)
+
+    return send_file(buf, as_attachment=True, mimetype=XLSX_MIMETYPE,
+                     download_name=output_filename_for(filename, marksheet_type))
+
+def save_path_for(filename):
+    """Unique upload path, so concurrent uploads of the same name never share
+    (or delete) each other's file."""
+    return Path(current_app.config["UPLOAD_FOLDER"]) / f"{uuid4().hex}_{filename}"
+
+def start_processing(marksheet_type, filepath, filename):
+    """Queue or run processing for a saved upload and build the response.
+
+    With ?download=1 (and no Celery worker) the workbook itself is returned
+    instead of a JSON body pointing at /output.
+    """
+    user = current_user()
+    user_id = user.id if user else None
+    celery_app = current_app.extensions.get("celery")
+    if celery_app is not None:
+        task = celery_app.send_task(
+            "marksheet.run_processing",
+            args=(marksheet_type, str(filepath), user_id, filename),
+            queue=marksheet_type
+        )
+        return jsonify({
+            "success": True,
+            "message": "Processing queued",
+            "task_id": task.id,
+            "status_url": url_for("processing.task_status", task_id=task.id)
+        }), 202
+
+    try:
+        if request.args.get("download") == "1":
+            return download_processed(marksheet_type, str(filepath), user_id, filename)
+
+        result = run_processing(marksheet_type, str(filepath), user_id, filename)
+        return jsonify({
+            "success": True,
+            "message": f"Processed {result['records']} records",
+            "output_file": result["output_file"]
+        })
+    except Exception as e:
+        logger.exception("Processing error")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+def allowed_file(name):
+    _, dot, ext = name.rpartition(".")
+    return bool(dot) and ext.lower() in ALLOWED_EXTENSIONS
+
+def processing_unavailable():
+    return not PROCESSOR_AVAILABLE and "celery" not in current_app.extensions
+
+# ------------------------------------------------------------------------------
+# Routes
+# ------------------------------------------------------------------------------
+
+@processing_bp.route("/process/<marksheet_type>", methods=["POST"])
+def process_marksheet_route(marksheet_type):
+    if processing_unavailable():
+        return jsonify({"success": False, "message": "Processing unavailable on this server"}), 503
+
+    marksheet_type = marksheet_type.lower()
+    if marksheet_type not in MARKSHEET_TYPES:
+        return jsonify({"success": False, "message": f"Unknown marksheet type: {marksheet_type}"}), 400
+
+    if "file" not in request.files:
+        return jsonify({"success": False, "message": "No file uploaded"}), 400
+
+    file = request.files["file"]
+    if not file or file.filename == "":
+        return jsonify({"success": False, "message": "Empty file"}), 400
+
+    filename = secure_filename(file.filename)
+    if not allowed_file(filename):
+        return jsonify({"success": False, "message": "Invalid file type. Please upload PDF, JPG, JPEG, or PNG files only."}), 400
+
+    filepath = save_path_for(filename)
+    file.save(filepath)
+
+    return start_processing(marksheet_type, filepath, filename)
+
+@processing_bp.route("/process/<marksheet_type>/stream", methods=["POST"])
+def process_marksheet_stream_route(marksheet_type):
+    """Preferred upload path for large PDFs: the raw request body is the file
+    (Content-Type: application/octet-stream, name in X-Filename) and is copied
+    to disk chunk by chunk instead of going through the multipart parser."""
+    if processing_unavailable():
+        return jsonify({"success": False, "message": "Processing unavailable on this server"}), 503
+
+    marksheet_type = marksheet_type.lower()
+    if marksheet_type not in MARKSHEET_TYPES:
+        return jsonify({"success": False, "message": f"Unknown marksheet type: {marksheet_type}"}), 400
+
+    filename = secure_filename(request.headers.get("X-Filename", ""))
+    if not filename:
+        return jsonify({"success": False, "message": "Missing X-Filename header"}), 400
+    if not allowed_file(filename):
+        return jsonify({"success": False, "message": "Invalid file type. Please upload PDF, JPG, JPEG, or PNG files only."}), 400
+
+    filepath = save_path_for(filename)
+    try:
+        with open(filepath, "wb") as f:
+            shutil.copyfileobj(request.stream, f, length=UPLOAD_CHUNK_SIZE)
+    except BaseException:
+        # Too large, client disconnected mid-upload, disk full...: never
+        # leave a partial upload behind
+        discard_upload(filepath)
+        raise
+
+    if filepath.stat().st_size == 0:
+        filepath.unlink()
+        return jsonify({"success": False, "message": "Empty file"}), 400
+
+    return start_processing(marksheet_type, filepath, filename)
+
+@processing_bp.route("/api/task/<task_id>")
+def task_status(task_id):
+    celery_app = current_app.extensions.get("celery")
+    if celery_app is None:
+        return jsonify({"success": False, "message": "Background processing is not enabled"}), 404
+
+    result = celery_app.AsyncResult(task_id)
+    payload = {"task_id": task_id, "state": result.state}
+    if result.successful():
+        payload.update(success=True, message=f"Processed {result.result['records']} records",
+                       output_file=result.result["output_file"])
+    elif result.failed():
+        payload.update(success=False, message=str(result.result))
+    return jsonify(payload)
+
+@processing_bp.route("/api/history")
+def upload_history():
+    user = current_user()
+    if not user:
+        return jsonify({"success": False, "message": "Not logged in"}), 401
+
+    rows = (
+        db.session.query(Marksheet.id, Marksheet.filename, Marksheet.type, Marksheet.status, Marksheet.created_at)
+        .filter_by(user_id=user.id)
+        .order_by(Marksheet.created_at.desc())
+        .limit(100)
+        .all()
+    )
+    return jsonify([
+        {
+            "id": r.id,
+            "filename": r.filename,
+            "marksheet_type": r.type,
+            "status": r.status,
+            "date": r.created_at.strftime("%Y-%m-%d %H:%M") if r.created_at else None
+        }
+        for r in rows
+    ])
+
+@processing_bp.route("/output/<path:filename>")
+def serve_output(filename):
+    # Behind nginx, hand the transfer off via X-Accel-Redirect so the worker
+    # is released as soon as the headers are sent
+    accel_prefix = current_app.config.get("OUTPUT_ACCEL_PREFIX")
+    if accel_prefix:
+        path = safe_join(current_app.config["OUTPUT_FOLDER"], filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        # nginx keeps this response's Content-Type for the redirected file
+        return Response(mimetype=XLSX_MIMETYPE, headers={
+            "X-Accel-Redirect": f"{accel_prefix.rstrip('/')}/{filename}",
+            "Content-Disposition": f'attachment; filename="{os.path.basename(path)}"',
+            "Cache-Control": f"private, max-age={OUTPUT_MAX_AGE}"
+        })
+    # send_from_directory honours USE_X_SENDFILE (Apache/lighttpd) on its own;
+    # ETag/Last-Modified let repeat downloads come back as 304 Not Modified
+    response = send_from_directory(current_app.config["OUTPUT_FOLDER"], filename,
+                                   conditional=True, etag=True, max_age=OUTPUT_MAX_AGE)
+    # Workbooks hold students' personal details: browser cache only
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
@@ -1,9 +1,19 @@
 import re
 import os
+import math
+import json
+import shutil
+import atexit
+import hashlib
 import sys
 import platform
 import logging
+import multiprocessing
 import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
 import numpy as np
 import pandas as pd
 from pathlib import Path
@@ -12,14 +22,55 @@ from PIL import Image, ImageFilter
 from pdf2image import convert_from_path
 import pytesseract
 import cv2
-from openpyxl import load_workbook
+from openpyxl import Workbook, load_workbook
 from openpyxl.utils import get_column_letter
 
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Resolved tool paths are remembered between runs, so warm starts skip the
+# filesystem search and the Tesseract probe
+def _path_cache_file():
+    try:
+        return Path.home() / '.cache' / 'marksheet' / 'paths.json'
+    except (RuntimeError, KeyError):
+        # No home directory (e.g. a service user): run without the cache
+        return None
+
+def _load_path_cache():
+    cache_file = _path_cache_file()
+    if cache_file is None:
+        return {}
+    try:
+        return json.loads(cache_file.read_text())
+    except (OSError, ValueError):
+        return {}
+
+def _save_path_cache(key, path):
+    cache_file = _path_cache_file()
+    if cache_file is None:
+        return
+    cache = _load_path_cache()
+    cache[key] = path
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        cache_file.write_text(json.dumps(cache))
+    except OSError as e:
+        logger.warning(f"Could not write path cache {cache_file}: {e}")
+
 # Auto-configure tesseract path based on platform
 def configure_tesseract():
+    cached = _load_path_cache().get('tesseract')
+    if cached and Path(cached).exists():
+        pytesseract.pytesseract.tesseract_cmd = cached
+        logger.info(f"Tesseract found at: {cached} (cached)")
+        return True
+
     system = platform.system().lower()
     common_paths = {
         'windows': [
@@ -43,8 +94,17 @@ def configure_tesseract():
         if Path(path).exists():
             pytesseract.pytesseract.tesseract_cmd = path
             logger.info(f"Tesseract found at: {path}")
+            _save_path_cache('tesseract', path)
             return True
 
+    # Look it up on PATH before paying for a probe run
+    path = shutil.which('tesseract')
+    if path:
+        pytesseract.pytesseract.tesseract_cmd = path
+        logger.info(f"Tesseract found in system PATH: {path}")
+        _save_path_cache('tesseract', path)
+        return True
+
     # Try default
     try:
         pytesseract.image_to_string(Image.new('RGB', (100, 100), color='white'))
@@ -58,6 +118,11 @@ def configure_tesseract():
 
 # Auto-configure poppler path based on platform
 def configure_poppler():
+    cached = _load_path_cache().get('poppler')
+    if cached and Path(cached).exists():
+        logger.info(f"Poppler found at: {cached} (cached)")
+        return cached
+
     system = platform.system().lower()
     
     # Your specific poppler path
@@ -85,6 +150,7 @@ def configure_poppler():
     for path in paths_to_try:
         if Path(path).exists():
             logger.info(f"Poppler found at: {path}")
+            _save_path_cache('poppler', path)
             return path
     
     logger.warning("Poppler path not found, will try without specifying path")
@@ -96,199 +162,438 @@ if not configure_tesseract():
 # Get poppler path
 POPPLER_PATH = configure_poppler()
 
-def advanced_preprocessing(image):
-    img = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2GRAY)
-    variations = []
+# PDF rasterization: 150 DPI keeps printed marksheet text legible for
+# Tesseract (an A4 page is ~1240x1754 px) at ~36% of the pixels of 250 DPI;
+# smaller pages still get the 2x upscale variation in advanced_preprocessing
+PDF_DPI = 150
+PDF_JPEG_QUALITY = 85
+
+# LSTM engine, one uniform block of text; fields are dark-on-light print, so
+# Tesseract's retry of low-confidence lines as inverted text is wasted work
+OCR_LANG = 'eng'
+OCR_CONFIG = '--oem 1 --psm 6 -c tessedit_do_invert=0'
+
+# Optional GPU preprocessing (needs an OpenCV build with CUDA); set
+# USE_CUDA=true to run the warps and denoise filters on the GPU
+def configure_cuda():
+    if os.environ.get('USE_CUDA', 'false').lower() != 'true':
+        return False
+    try:
+        devices = cv2.cuda.getCudaEnabledDeviceCount()
+    except (AttributeError, cv2.error):
+        devices = 0
+    if not devices:
+        logger.warning("USE_CUDA is set but no CUDA device is available; using the CPU")
+        return False
+    logger.info(f"CUDA preprocessing enabled ({devices} device(s))")
+    return True
+
+USE_CUDA = configure_cuda()
+
+# Tesseract runs as a subprocess, so OCR threads overlap on separate cores.
+# One pool serves every page and variation instead of one per call.
+OCR_POOL_SIZE = max(4, os.cpu_count() or 1)
+
+# Parallelism comes from concurrent Tesseract processes; letting each of them
+# also start an OpenMP thread per core would oversubscribe the CPU
+os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+def _new_ocr_pool():
+    return ThreadPoolExecutor(max_workers=OCR_POOL_SIZE, thread_name_prefix='ocr')
+
+_OCR_POOL = _new_ocr_pool()
+
+def _shutdown_ocr_pool():
+    _OCR_POOL.shutdown()
+
+atexit.register(_shutdown_ocr_pool)
+
+# PDF pages are spread over one long-lived pool of worker processes, shared
+# by every upload like _OCR_POOL is by every page. The CPUs are split between
+# the workers, so together they run about one Tesseract per core however
+# many uploads are in flight.
+PAGE_POOL_WORKERS = max(1, (os.cpu_count() or 1) // 2)
+# One- and two-page PDFs stay in-process: they gain little from the pool,
+# and when it is cold they would pay for starting a worker
+PAGE_POOL_MIN_PAGES = 3
+
+# Workers start from a fresh interpreter rather than a fork() of a
+# (multithreaded) server process; with forkserver they are forked from a
+# server that has already imported this module
+_PAGE_MP_CONTEXT = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+if _PAGE_MP_CONTEXT.get_start_method() == 'forkserver':
+    _PAGE_MP_CONTEXT.set_forkserver_preload([__name__])
+
+_PAGE_POOL = None
+_PAGE_POOL_LOCK = threading.Lock()
+
+def _init_page_worker(ocr_threads):
+    """Shrink a page worker's OCR pool to its share of the CPUs."""
+    global OCR_POOL_SIZE, _OCR_POOL
+    _OCR_POOL.shutdown()
+    OCR_POOL_SIZE = ocr_threads
+    _OCR_POOL = _new_ocr_pool()
+
+def _page_pool():
+    """The shared page pool, started on first use (workers spawn on demand)."""
+    global _PAGE_POOL
+    with _PAGE_POOL_LOCK:
+        if _PAGE_POOL is None:
+            _PAGE_POOL = ProcessPoolExecutor(
+                max_workers=PAGE_POOL_WORKERS, mp_context=_PAGE_MP_CONTEXT,
+                initializer=_init_page_worker,
+                initargs=(max(1, (os.cpu_count() or 1) // PAGE_POOL_WORKERS),))
+        return _PAGE_POOL
+
+def _discard_page_pool(pool):
+    # A worker died; the pool is unusable, so the next upload starts a new one
+    global _PAGE_POOL
+    with _PAGE_POOL_LOCK:
+        if _PAGE_POOL is pool:
+            _PAGE_POOL = None
+    pool.shutdown(wait=False)
+
+def _shutdown_page_pool():
+    if _PAGE_POOL is not None:
+        _PAGE_POOL.shutdown()
+
+atexit.register(_shutdown_page_pool)
+
+# ------------------------------------------------------------------------------
+# Field patterns (compiled once; they run per OCR text on every page)
+# ------------------------------------------------------------------------------
+
+# One pass over the text for every "<label> <number>" form; labels are listed
+# most specific first and a more specific label wins over an earlier match
+_TOTAL_LABELS = ("total_marks", "marks_obtained", "grand_total", "total")
+_TOTAL_RE = re.compile(
+    r'(?:(?P<total_marks>TOTAL\s*MARKS?)|(?P<marks_obtained>MARKS\s*OBTAINED)'
+    r'|(?P<grand_total>GRAND\s*TOTAL)|(?P<total>TOTAL))'
+    r'\s*[:\-]?\s*(?P<n>[\dO l]{3,6})', re.IGNORECASE)
+# Fallback for "<number> marks" when no label precedes the figure
+_TOTAL_SUFFIX_RE = re.compile(r'(?P<n>[\dO l]{3,6})\s*(?:marks|total|obtained)', re.IGNORECASE)
+
+_NAME_RE = re.compile(
+    r'Name\s*(?:of\s+the\s+(?:Candidate|Student))?\s*[:\-]?\s*([A-Z\s.]{3,})', re.IGNORECASE)
+# Name text up to the first label that follows it on the marksheet
+_NAME_STOPWORD_RE = re.compile(
+    r'^(.*?)\b(?:Date|Register|Roll|Number|Marks|School|Std|Gender|Father|Mother)\b',
+    re.IGNORECASE | re.DOTALL)
+_DOB_RE = re.compile(
+    r'Date\s+of\s+Birth\s*[:\-]?\s*(\d{1,2}[-/.\s]\d{1,2}[-/.\s]\d{2,4})', re.IGNORECASE)
+_REG_RE = re.compile(r'(Register|Roll|Admission)\s+Number\s*[:\-]?\s*(\d{5,})', re.IGNORECASE)
+
+_SEM_NAME_RE = re.compile(
+    r"Name\s*of\s*the\s*Candidate\s*[:\-]?\s*(.+?)\s+(?:Register|Reg|Department|Degree)", re.IGNORECASE)
+_SEM_INITIAL_RE = re.compile(r"\b([A-Z])\.(?=[A-Z])")
+_SEM_NAME_CLEAN_RE = re.compile(r"[^A-Z .]+", re.IGNORECASE)
+_SEM_REG_RE = re.compile(r"Register\s*Number\s*[:\-]?\s*([A-Z0-9]+)", re.IGNORECASE)
+_DEPT_RE = re.compile(r"Degree\s*\/\s*Branch\s*[:\-]?\s*(.+)", re.IGNORECASE)
+_CLEAN_DEPT_RE = re.compile(r'[\u00AE\u00A9®©:]+')
+
+_CGPA_RE = re.compile(
+    r'(?:CGPA|C\.G\.P\.A\.?|C G P A)\s*[:\-]?\s*([0-9OIl]{1,2}\.?[0-9OIl]{1,2})', re.IGNORECASE)
+_SGPA_RE = re.compile(
+    r'(?:SGPA|S\.G\.P\.A\.?|S G P A)\s*[:\-]?\s*([0-9OIl]{1,2}\.?[0-9OIl]{1,2})', re.IGNORECASE)
+_GPA_VALID_RE = re.compile(r'^\d{1,2}\.?\d{0,2}$')
+
+# OCR look-alikes mapped to digits, spaces dropped, in a single translate pass
+# (the total patterns are case-insensitive, so 'o' and 'L' can also be
+# captured; those are dropped rather than mapped)
+_TOTAL_TRANS = str.maketrans({'O': '0', 'l': '1', 'o': None, 'L': None, ' ': None})
+_GPA_TRANS = str.maketrans({'O': '0', 'I': '1', 'l': '1', ' ': None})
+
+def to_grayscale_array(image):
+    # PDF pages are rendered in grayscale already; only colour inputs
+    # (uploaded photos/scans) need the conversion
+    if image.mode == 'L':
+        return np.asarray(image)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2GRAY)
+
+# Minimum ratio of the foreground's principal second moments for its axis to
+# be trusted; rounder ink layouts (sparse blocks, ruled tables) give unstable
+# angles, so they get no deskew variation
+SKEW_MIN_ELONGATION = 2.5
+
+def estimate_skew_angle(img):
+    """Skew of the foreground (pixels below 255) in degrees, in [-45, 45).
+
+    The principal axis of the foreground follows the text lines (or the
+    page's columns); its angle is folded to the nearest multiple of 90.
+    cv2.moments reads the mask in one pass without materializing the pixel
+    coordinates; a 4x subsample is plenty for the angle. Returns 0.0 when the
+    foreground is not elongated enough for the axis to mean anything.
+    """
+    m = cv2.moments(cv2.bitwise_not(img[::4, ::4]), binaryImage=True)
+    if not m['m00']:
+        return 0.0
+    # Eigenvalues of the covariance [[mu20, mu11], [mu11, mu02]]
+    mean = (m['mu20'] + m['mu02']) / 2
+    spread = math.hypot((m['mu20'] - m['mu02']) / 2, m['mu11'])
+    if mean + spread < SKEW_MIN_ELONGATION * (mean - spread):
+        return 0.0
+    theta = 0.5 * math.degrees(math.atan2(2 * m['mu11'], m['mu20'] - m['mu02']))
+    return (theta + 45) % 90 - 45
 
-    # Original grayscale
-    variations.append(Image.fromarray(img))
+def advanced_preprocessing(image):
+    """Yield OCR variations of ``image``, cheapest first.
 
-    # Resize if small
+    Callers stop iterating once every field has been found, so the costly
+    variations (upscale, denoise) are only built for hard pages.
+    """
+    img = to_grayscale_array(image)
     h, w = img.shape
-    if h < 1000 or w < 700:
-        img2 = cv2.resize(img, (w*2, h*2), interpolation=cv2.INTER_CUBIC)
-        variations.append(Image.fromarray(img2))
-
-    # Deskew
-    coords = np.column_stack(np.where(img < 255))
-    angle = cv2.minAreaRect(coords)[-1] if coords.size else 0
-    if angle < -45:
-        angle = -(90 + angle)
-    else:
-        angle = -angle
-    M = cv2.getRotationMatrix2D((w // 2, h // 2), angle, 1.0)
-    deskewed = cv2.warpAffine(img, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
-    variations.append(Image.fromarray(deskewed))
+
+    # With CUDA the page is uploaded once, the first time a GPU filter needs it
+    gpu = None
+    def on_gpu():
+        nonlocal gpu
+        if gpu is None:
+            gpu = cv2.cuda_GpuMat()
+            gpu.upload(img)
+        return gpu
+
+    # Original grayscale
+    yield Image.fromarray(img)
 
     # Binarization (Otsu)
     _, binary = cv2.threshold(img, 150, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-    variations.append(Image.fromarray(binary))
+    yield Image.fromarray(binary)
+
+    # Deskew (measured on the Otsu mask so JPEG noise in the background does
+    # not count as ink; a page that is already straight would just repeat the
+    # grayscale pass, so skip it)
+    angle = estimate_skew_angle(binary)
+    if abs(angle) >= 0.5:
+        M = cv2.getRotationMatrix2D((w // 2, h // 2), angle, 1.0)
+        if USE_CUDA:
+            deskewed = cv2.cuda.warpAffine(on_gpu(), M, (w, h), flags=cv2.INTER_LINEAR,
+                                           borderMode=cv2.BORDER_REPLICATE).download()
+        else:
+            deskewed = cv2.warpAffine(img, M, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+        yield Image.fromarray(deskewed)
 
     # Adaptive threshold
     adaptive = cv2.adaptiveThreshold(
         img, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 2)
-    variations.append(Image.fromarray(adaptive))
+    yield Image.fromarray(adaptive)
 
-    # Denoising
-    denoised = cv2.fastNlMeansDenoising(img, None, 30, 7, 21)
-    variations.append(Image.fromarray(denoised))
+    # Sharpening (UnsharpMask covers what the fixed SHARPEN kernel would add)
+    yield Image.fromarray(img).filter(ImageFilter.UnsharpMask(radius=2, percent=150, threshold=3))
 
-    # PIL sharpness and contrast
-    pil_img = Image.fromarray(img)
-    variations.append(pil_img.filter(ImageFilter.UnsharpMask(radius=2, percent=150, threshold=3)))
-    variations.append(pil_img.filter(ImageFilter.SHARPEN))
+    # Resize if small (bilinear: cubic costs ~2x and does not help OCR on print)
+    if h < 1000 or w < 700:
+        if USE_CUDA:
+            img2 = cv2.cuda.resize(on_gpu(), (w*2, h*2), interpolation=cv2.INTER_LINEAR).download()
+        else:
+            img2 = cv2.resize(img, (w*2, h*2), interpolation=cv2.INTER_LINEAR)
+        yield Image.fromarray(img2)
+
+    # Denoising (edge-preserving bilateral; see heavy_denoise for the NL-means pass)
+    if USE_CUDA:
+        denoised = cv2.cuda.bilateralFilter(on_gpu(), 5, 50, 50).download()
+    else:
+        denoised = cv2.bilateralFilter(img, 5, 50, 50)
+    yield Image.fromarray(denoised)
+
+def heavy_denoise(image):
+    """NL-means denoise: far costlier than every other variation combined, so
+    it is only a last resort for pages that are still missing several fields."""
+    img = to_grayscale_array(image)
+    if USE_CUDA:
+        gpu = cv2.cuda_GpuMat()
+        gpu.upload(img)
+        return Image.fromarray(
+            cv2.cuda.fastNlMeansDenoising(gpu, 30, search_window=21, block_size=7).download())
+    return Image.fromarray(cv2.fastNlMeansDenoising(img, None, 30, 7, 21))
+
+def ocr_variations(variations):
+    return list(_OCR_POOL.map(lambda v: pytesseract.image_to_string(v, lang=OCR_LANG, config=OCR_CONFIG), variations))
+
+def image_digest(image):
+    """Cheap fingerprint of a variation's pixels (xxhash when installed)."""
+    data = image.tobytes()
+    if xxhash is not None:
+        return image.size, xxhash.xxh64_intdigest(data)
+    return image.size, hashlib.blake2b(data, digest_size=8).digest()
+
+def extract_fields(page_image, info, fill):
+    """OCR variations of ``page_image`` until ``info`` has no empty fields.
+
+    ``fill(text, info)`` fills whichever fields are still empty from one OCR
+    text. The cheapest variation is tried alone; if fields are still missing
+    the rest are OCR'd a pool-width batch at a time.
+    """
+    def missing():
+        # Percentage is derived from Total Marks, so the pair counts once
+        return sum(v in ("", None) for k, v in info.items() if k != "Percentage")
 
-    return variations
+    variations = advanced_preprocessing(page_image)
+    # Variations that come out pixel-identical (e.g. on clean, straight
+    # scans) would only repeat an OCR pass already made for this page
+    seen = set()
+    batch_size = 1
+    while True:
+        batch = list(islice(variations, batch_size))
+        if not batch:
+            break
+        unique = []
+        for v in batch:
+            key = image_digest(v)
+            if key not in seen:
+                seen.add(key)
+                unique.append(v)
+        for text in ocr_variations(unique):
+            fill(text, info)
+        if not missing():
+            return info
+        batch_size = OCR_POOL_SIZE
+
+    if missing() > 1:
+        fill(ocr_variations([heavy_denoise(page_image)])[0], info)
+    return info
+
+def parse_total(total_raw):
+    # The capture only admits digits, 'O', 'l' and spaces, so after the
+    # translate int() either sees pure digits or an empty string
+    try:
+        return int(total_raw.translate(_TOTAL_TRANS))
+    except ValueError:
+        return None
+
+def find_total(ocr_text):
+    best_rank, best_total = None, None
+    for match in _TOTAL_RE.finditer(ocr_text):
+        total = parse_total(match.group('n'))
+        if total is None:
+            continue
+        rank = next(i for i, label in enumerate(_TOTAL_LABELS) if match.group(label))
+        if best_rank is None or rank < best_rank:
+            best_rank, best_total = rank, total
+            if rank == 0:
+                break
+    if best_total is not None:
+        return best_total
+    match = _TOTAL_SUFFIX_RE.search(ocr_text)
+    return parse_total(match.group('n')) if match else None
 
 def robust_total_marks_extraction(ocr_texts):
-    possible_patterns = [
-        r'TOTAL\s*MARKS?\s*[:\-]?\s*([\dO l]{3,6})',
-        r'MARKS\s*OBTAINED\s*[:\-]?\s*([\dO l]{3,6})',
-        r'GRAND\s*TOTAL\s*[:\-]?\s*([\dO l]{3,6})',
-        r'TOTAL\s*[:\-]?\s*([\dO l]{3,6})',
-        r'Total\s*([\dO l]{3,6})',
-        r'([\dO l]{3,6})\s*(marks|total|obtained)',
-    ]
     for ocr_text in ocr_texts:
-        for pat in possible_patterns:
-            match = re.search(pat, ocr_text, re.IGNORECASE)
-            if match:
-                total_raw = match.group(1)
-                total_cleaned = total_raw.replace('O', '0').replace('l', '1').replace(' ', '')
-                total_cleaned = re.sub(r'[^\d]', '', total_cleaned)
-                if total_cleaned.isdigit():
-                    total = int(total_cleaned)
-                    # Follow dynamic max marks
-                    if total <= 500:
-                        max_marks = 500
-                    elif total <= 600:
-                        max_marks = 600
-                    else:
-                        max_marks = 625
-                    pct = round((total / max_marks) * 100, 2)
-                    return total, pct
+        total = find_total(ocr_text)
+        if total is not None:
+            # Follow dynamic max marks
+            if total <= 500:
+                max_marks = 500
+            elif total <= 600:
+                max_marks = 600
+            else:
+                max_marks = 625
+            pct = round((total / max_marks) * 100, 2)
+            return total, pct
     return None, None
 
-def extract_info_from_page(page_image):
-    variations = advanced_preprocessing(page_image)
-    ocr_texts = [pytesseract.image_to_string(v, config='--psm 6') for v in variations]
-
+def fill_school_fields(text, info):
     # Name extraction robust pattern
-    name_match = re.search(
-        r'Name\s*(?:of\s+the\s+(?:Candidate|Student))?\s*[:\-]?\s*([A-Z\s.]{3,})',
-        ocr_texts[0], re.IGNORECASE)
-    name = ""
-    if name_match:
-        raw_name = name_match.group(1)
-        cleaned_name = re.split(
-            r'\b(Date|Register|Roll|Number|Marks|School|Std|Gender|Father|Mother)\b',
-            raw_name, flags=re.IGNORECASE)[0].strip()
-        parts = [p for p in cleaned_name.split() if p.isalpha()]
-        name = " ".join([x.capitalize() for x in parts])
+    if not info["Name"]:
+        name_match = _NAME_RE.search(text)
+        if name_match:
+            raw_name = name_match.group(1)
+            stop = _NAME_STOPWORD_RE.match(raw_name)
+            cleaned_name = stop.group(1) if stop else raw_name
+            info["Name"] = " ".join(w for w in cleaned_name.split() if w.isalpha()).title()
 
     # DOB extraction
-    dob_match = re.search(
-        r'Date\s+of\s+Birth\s*[:\-]?\s*(\d{1,2}[-/.\s]\d{1,2}[-/.\s]\d{2,4})',
-        ocr_texts[0], re.IGNORECASE)
-    dob = dob_match.group(1).replace(' ', '-') if dob_match else ""
+    if not info["DOB"]:
+        dob_match = _DOB_RE.search(text)
+        if dob_match:
+            info["DOB"] = dob_match.group(1).replace(' ', '-')
 
     # Register Number / Roll Number
-    reg_match = re.search(
-        r'(Register|Roll|Admission)\s+Number\s*[:\-]?\s*(\d{5,})',
-        ocr_texts[0], re.IGNORECASE)
-    reg_no = reg_match.group(2).strip() if reg_match else ""
+    if not info["Register Number"]:
+        reg_match = _REG_RE.search(text)
+        if reg_match:
+            info["Register Number"] = reg_match.group(2).strip()
 
     # Total Marks & Percentage
-    total, percentage = robust_total_marks_extraction(ocr_texts)
-
-    return {
-        "Name": name,
-        "DOB": dob,
-        "Register Number": reg_no,
-        "Total Marks": total,
-        "Percentage": percentage
+    if info["Total Marks"] is None:
+        info["Total Marks"], info["Percentage"] = robust_total_marks_extraction([text])
+
+def extract_info_from_page(page_image):
+    info = {
+        "Name": "",
+        "DOB": "",
+        "Register Number": "",
+        "Total Marks": None,
+        "Percentage": None
     }
+    return extract_fields(page_image, info, fill_school_fields)
 
-def extract_semester_info_from_page(page_image):
-    variations = advanced_preprocessing(page_image)
-    ocr_texts = [pytesseract.image_to_string(v, config='--psm 6') for v in variations]
+def clean_score(score):
+    return score.translate(_GPA_TRANS)
 
-    base_text = ocr_texts[0]
+def find_score(pattern, text):
+    for m in pattern.finditer(text):
+        cleaned = clean_score(m.group(1))
+        if _GPA_VALID_RE.match(cleaned):
+            return cleaned
+    return ""
 
+def fill_semester_fields(text, info):
     # Name extraction
-    name = ""
-    name_match = re.search(
-        r"Name\s*of\s*the\s*Candidate\s*[:\-]?\s*(.+?)\s+(?:Register|Reg|Department|Degree)",
-        base_text, re.IGNORECASE)
-    if name_match:
-        raw_name = name_match.group(1).strip()
-        raw_name = re.sub(r"\b([A-Z])\.(?=[A-Z])", r"\1. ", raw_name)
-        name = re.sub(r"[^A-Z .]+", "", raw_name, flags=re.IGNORECASE).strip()
+    if not info["Name"]:
+        name_match = _SEM_NAME_RE.search(text)
+        if name_match:
+            raw_name = name_match.group(1).strip()
+            raw_name = _SEM_INITIAL_RE.sub(r"\1. ", raw_name)
+            info["Name"] = _SEM_NAME_CLEAN_RE.sub("", raw_name).strip()
 
     # Register Number
-    reg_no = ""
-    reg_match = re.search(r"Register\s*Number\s*[:\-]?\s*([A-Z0-9]+)", base_text, re.IGNORECASE)
-    if reg_match:
-        reg_no = reg_match.group(1).strip()
+    if not info["Register Number"]:
+        reg_match = _SEM_REG_RE.search(text)
+        if reg_match:
+            info["Register Number"] = reg_match.group(1).strip()
 
     # Department
-    department = ""
-    dept_match = re.search(r"Degree\s*\/\s*Branch\s*[:\-]?\s*(.+)", base_text, re.IGNORECASE)
-    if dept_match:
-        department = dept_match.group(1).strip()
-        department = re.sub(r'[\u00AE\u00A9®©:]+', '', department).strip()
+    if not info["Department"]:
+        dept_match = _DEPT_RE.search(text)
+        if dept_match:
+            department = dept_match.group(1).strip()
+            info["Department"] = _CLEAN_DEPT_RE.sub('', department).strip()
 
     # CGPA / SGPA extraction
-    cgpa, sgpa = "", ""
-    cgpa_patterns = [
-        r'CGPA\s*[:\-]?\s*([0-9OIl]{1,2}\.?[0-9OIl]{1,2})',
-        r'C\.G\.P\.A\.?\s*[:\-]?\s*([0-9OIl]{1,2}\.?[0-9OIl]{1,2})',
-        r'C G P A\s*[:\-]?\s*([0-9OIl]{1,2}\.?[0-9OIl]{1,2})'
-    ]
-    sgpa_patterns = [
-        r'SGPA\s*[:\-]?\s*([0-9OIl]{1,2}\.?[0-9OIl]{1,2})',
-        r'S\.G\.P\.A\.?\s*[:\-]?\s*([0-9OIl]{1,2}\.?[0-9OIl]{1,2})',
-        r'S G P A\s*[:\-]?\s*([0-9OIl]{1,2}\.?[0-9OIl]{1,2})'
-    ]
-    def clean_score(score):
-        return score.replace('O', '0').replace('I', '1').replace('l', '1').replace(' ', '')
-
-    for text in ocr_texts:
-        if not cgpa:
-            for pat in cgpa_patterns:
-                m = re.search(pat, text, re.IGNORECASE)
-                if m:
-                    cleaned = clean_score(m.group(1))
-                    if re.match(r'^\d{1,2}\.?\d{0,2}$', cleaned):
-                        cgpa = cleaned
-                        break
-        if not sgpa:
-            for pat in sgpa_patterns:
-                m = re.search(pat, text, re.IGNORECASE)
-                if m:
-                    cleaned = clean_score(m.group(1))
-                    if re.match(r'^\d{1,2}\.?\d{0,2}$', cleaned):
-                        sgpa = cleaned
-                        break
-        if cgpa and sgpa:
-            break
+    if not info["CGPA"]:
+        info["CGPA"] = find_score(_CGPA_RE, text)
+    if not info["SGPA"]:
+        info["SGPA"] = find_score(_SGPA_RE, text)
 
-    return {
-        "Name": name,
-        "Register Number": reg_no,
-        "Department": department,
-        "CGPA": cgpa,
-        "SGPA": sgpa
+def extract_semester_info_from_page(page_image):
+    info = {
+        "Name": "",
+        "Register Number": "",
+        "Department": "",
+        "CGPA": "",
+        "SGPA": ""
     }
+    return extract_fields(page_image, info, fill_semester_fields)
 
-def process_marksheet(marksheet_type, file_path):
-    import time
-    import gc
-    import shutil
-    import os
-    
+def _process_page_path(page_path, marksheet_type):
+    """Extract one rendered PDF page and delete it; runs in a worker process."""
+    try:
+        with Image.open(page_path) as page:
+            if marksheet_type in ['10th', '12th']:
+                return extract_info_from_page(page)
+            elif marksheet_type == 'semester':
+                return extract_semester_info_from_page(page)
+            raise ValueError(f"Unknown marksheet type: {marksheet_type}")
+    finally:
+        os.remove(page_path)
+
+def iter_marksheet_rows(marksheet_type, file_path):
+    """Yield one dict of extracted fields per page, in page order."""
     marksheet_type = marksheet_type.lower()
-    results = []
 
     if not Path(file_path).exists():
         raise FileNotFoundError(f"File not found: {file_path}")
@@ -301,9 +606,9 @@ def process_marksheet(marksheet_type, file_path):
         # Single image processing
         image = Image.open(file_path)
         if marksheet_type in ['10th', '12th']:
-            results.append(extract_info_from_page(image))
+            yield extract_info_from_page(image)
         elif marksheet_type == 'semester':
-            results.append(extract_semester_info_from_page(image))
+            yield extract_semester_info_from_page(image)
         image.close()
     else:
         # PDF processing with Windows-specific file handling
@@ -317,10 +622,12 @@ def process_marksheet(marksheet_type, file_path):
             # THIS IS WHERE THE POPPLER PATH IS ADDED:
             convert_kwargs = {
                 'pdf_path': file_path,
-                'dpi': 250,  # Reduced DPI for smaller files
+                'dpi': PDF_DPI,
                 'output_folder': temp_dir,
                 'fmt': 'JPEG',  # Force JPEG instead of PPM
-                'jpegopt': {'quality': 95}
+                'grayscale': True,  # pdftoppm -gray: 1 byte/pixel, no RGB decode
+                'jpegopt': {'quality': PDF_JPEG_QUALITY},
+                'paths_only': True  # Pages stay on disk until they are processed
             }
             
             # Add poppler_path if available
@@ -328,32 +635,48 @@ def process_marksheet(marksheet_type, file_path):
                 convert_kwargs['poppler_path'] = POPPLER_PATH
                 logger.info(f"Using poppler path: {POPPLER_PATH}")
             
-            pages = convert_from_path(**convert_kwargs)
-            logger.info(f"Converted {len(pages)} pages from PDF")
+            page_paths = convert_from_path(**convert_kwargs)
+            logger.info(f"Converted {len(page_paths)} pages from PDF")
             
-            # Process each page
-            for i, page in enumerate(pages):
-                logger.info(f"Processing page {i+1} of {len(pages)}")
+            # Pages are independent and CPU-bound, so spread them over the
+            # page pool. Daemonic processes (e.g. Celery prefork workers)
+            # cannot start children, so they process pages in turn; so does
+            # CUDA, where the GPU is the shared resource.
+            if (len(page_paths) >= PAGE_POOL_MIN_PAGES and not USE_CUDA
+                    and not multiprocessing.current_process().daemon):
+                pool = _page_pool()
                 try:
-                    if marksheet_type in ['10th', '12th']:
-                        info = extract_info_from_page(page)
-                    elif marksheet_type == 'semester':
-                        info = extract_semester_info_from_page(page)
-                    
-                    results.append(info)
-                    
-                    # Explicitly close the page
-                    page.close()
-                    del page
-                    
-                except Exception as e:
-                    logger.error(f"Error processing page {i+1}: {e}")
-                    continue
-            
-            # Clear pages list and force garbage collection
-            del pages
-            gc.collect()
-            time.sleep(0.5)  # Longer delay for Windows
+                    futures = [pool.submit(_process_page_path, p, marksheet_type) for p in page_paths]
+                except BrokenProcessPool:
+                    _discard_page_pool(pool)
+                    pool = _page_pool()
+                    futures = [pool.submit(_process_page_path, p, marksheet_type) for p in page_paths]
+                try:
+                    # Collect in submission order so rows keep page order
+                    for i, future in enumerate(futures):
+                        try:
+                            info = future.result()
+                        except BrokenProcessPool as e:
+                            logger.error(f"Error processing page {i+1}: {e}")
+                            _discard_page_pool(pool)
+                            continue
+                        except Exception as e:
+                            logger.error(f"Error processing page {i+1}: {e}")
+                            continue
+                        yield info
+                finally:
+                    # The pool outlives this upload: drop pages nobody will read
+                    for future in futures:
+                        future.cancel()
+            else:
+                for i, page_path in enumerate(page_paths):
+                    logger.info(f"Processing page {i+1} of {len(page_paths)}")
+                    try:
+                        info = _process_page_path(page_path, marksheet_type)
+                    except Exception as e:
+                        logger.error(f"Error processing page {i+1}: {e}")
+                        continue
+                    yield info
             
         except Exception as e:
             logger.error(f"PDF processing error: {e}")
@@ -363,12 +686,42 @@ def process_marksheet(marksheet_type, file_path):
             if temp_dir and os.path.exists(temp_dir):
                 cleanup_temp_directory(temp_dir)
 
-    if not results:
+def process_marksheet(marksheet_type, file_path):
+    # Rows are stored column-wise so the DataFrame is built without a
+    # per-row transpose
+    columns = {}
+    for info in iter_marksheet_rows(marksheet_type, file_path):
+        for field, value in info.items():
+            columns.setdefault(field, []).append(value)
+
+    if not columns:
         raise ValueError("No data could be extracted from the document")
         
-    df = pd.DataFrame(results)
+    df = pd.DataFrame(columns)
     return df
 
+def export_marksheet(marksheet_type, file_path, output):
+    """Write extracted rows straight to an .xlsx at ``output`` (a path or a
+    binary file object).
+
+    Rows go into an openpyxl write-only sheet as each page finishes, so no
+    DataFrame is built. Returns the number of rows written.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('marksheet')
+    records = 0
+    for info in iter_marksheet_rows(marksheet_type, file_path):
+        if not records:
+            ws.append(list(info))
+        ws.append(list(info.values()))
+        records += 1
+
+    if not records:
+        raise ValueError("No data could be extracted from the document")
+
+    wb.save(output)
+    return records
+
 def cleanup_temp_directory(temp_dir):
     """Windows-safe temporary directory cleanup with retries"""
     import time
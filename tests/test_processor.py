@@ -0,0 +1,73 @@
+import sys
+import shutil
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+if shutil.which("tesseract") is None:
+    pytest.skip("processor needs a tesseract binary to import", allow_module_level=True)
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from processor import estimate_skew_angle  # noqa: E402
+
+# A4 at the 150 DPI pages are rendered at
+PAGE_H, PAGE_W = 1754, 1240
+
+
+def text_lines(img, top, bottom, left, right, seed=0):
+    """Draw rows of word-sized dark boxes, like lines of printed text."""
+    rng = np.random.default_rng(seed)
+    for y in range(top, bottom, 40):
+        x = left
+        while x < right:
+            word = int(rng.integers(30, 120))
+            cv2.rectangle(img, (x, y), (min(x + word, right), y + 14), 0, -1)
+            x += word + 20
+
+
+def ruled_table(img):
+    for y in range(400, 1200, 50):
+        cv2.line(img, (200, y), (1000, y), 0, 2)
+    for x in range(200, 1001, 200):
+        cv2.line(img, (x, 400), (x, 1150), 0, 2)
+
+
+def rotated_mask(draw, angle):
+    """Otsu mask of a blank page with ``draw`` applied, rotated by ``angle``."""
+    img = np.full((PAGE_H, PAGE_W), 255, np.uint8)
+    draw(img)
+    M = cv2.getRotationMatrix2D((PAGE_W // 2, PAGE_H // 2), angle, 1.0)
+    img = cv2.warpAffine(img, M, (PAGE_W, PAGE_H), flags=cv2.INTER_LINEAR, borderValue=255)
+    _, binary = cv2.threshold(img, 150, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return binary
+
+
+def marks_block(img):
+    text_lines(img, 300, 500, 100, 1140)
+
+
+def sparse_block(img):
+    text_lines(img, 500, 900, 420, 820)
+
+
+@pytest.mark.parametrize("angle", [-10, -5, -3, 3, 5, 10])
+def test_skew_of_rotated_text_is_undone(angle):
+    # The estimate is the rotation that straightens the page
+    assert estimate_skew_angle(rotated_mask(marks_block, angle)) == pytest.approx(-angle, abs=1.0)
+
+
+def test_straight_text_is_not_deskewed():
+    assert abs(estimate_skew_angle(rotated_mask(marks_block, 0))) < 0.5
+
+
+@pytest.mark.parametrize("angle", [0, 5, 10])
+@pytest.mark.parametrize("draw", [sparse_block, ruled_table])
+def test_round_layouts_get_no_deskew(draw, angle):
+    # Their principal axis does not follow the text lines
+    assert estimate_skew_angle(rotated_mask(draw, angle)) == 0.0
+
+
+def test_blank_page():
+    assert estimate_skew_angle(np.full((PAGE_H, PAGE_W), 255, np.uint8)) == 0.0